@@ -0,0 +1,43 @@
+"""
+Combined ZKP Age Verification API
+
+Serves the simple commitment API (main.py) under /v1 and the enhanced
+client-side proof API (enhanced_zkp.py) under /v2 from a single FastAPI
+app, so both share one middleware stack, route table and OpenAPI schema.
+"""
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from decouple import Csv, config
+
+from main import router as main_router
+from enhanced_zkp import router as enhanced_router
+
+app = FastAPI(
+    title="ZKP Age Verification API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
+
+# Origins allowed to call the API from a browser, configured the same way
+# as zksnark_main.py (comma-separated CORS_ORIGINS; "*" allows any)
+CORS_ORIGINS = config("CORS_ORIGINS", default="http://localhost:3000", cast=Csv(post_process=tuple))
+LOCAL_ORIGIN_REGEX = r"http://(localhost|127\.0\.0\.1)(:\d+)?"
+
+# Add CORS middleware for Flutter frontend
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    allow_origin_regex=LOCAL_ORIGIN_REGEX,
+    allow_credentials=False,  # The API uses no cookies or auth headers
+    allow_methods=["GET", "POST"],
+    allow_headers=["*"],
+)
+
+app.include_router(main_router, prefix="/v1")
+app.include_router(enhanced_router, prefix="/v2")
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
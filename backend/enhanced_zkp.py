@@ -5,13 +5,38 @@ This version moves the age calculation to the client side and implements
 a more realistic ZKP scheme using cryptographic commitments.
 """
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
+import base64
 import hashlib
+import os
 import secrets
-import json
-from typing import Dict, Any, Optional
+import orjson
+from collections import deque
+from typing import Dict, Any, Optional, Tuple, Literal
 import hmac
+from operator import itemgetter
+from blake3 import blake3
+
+# hashlib's constructors are bound to OpenSSL's EVP digests, which select the
+# SHA-NI code path at runtime on CPUs that support it. Bind it once so the
+# hot paths skip the module attribute lookup.
+# (The age commitment is opaque to the server and uses BLAKE3 instead.)
+_sha256 = hashlib.sha256
+
+def _canon(data: Dict[str, Any]) -> bytes:
+    """Canonical (key-sorted) JSON bytes for hashing and signing"""
+    return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+# Fetches the fields server_verify_proof checks in a single C-level call
+_proof_fields = itemgetter("challenge", "proof_type", "meets_requirement")
+
+# Challenges are handed out from a pool filled by one large os.urandom()
+# read, rather than two small reads (challenge + server id) per request
+CHALLENGE_POOL_SIZE = 1024
+_CHALLENGE_BYTES = 32
+_SERVER_ID_BYTES = 16
 
 class EnhancedZKPVerifier:
     """
@@ -20,18 +45,31 @@ class EnhancedZKPVerifier:
     
     def __init__(self):
         self.secret_key = secrets.token_bytes(32)  # Server's secret key
+        self._challenge_pool = deque()
     
-    def generate_server_challenge(self) -> str:
-        """Server generates random challenge for the client"""
-        return secrets.token_hex(32)
+    def generate_server_challenge(self) -> Tuple[str, str]:
+        """
+        Server generates random challenge for the client
+        Returns a (challenge, server_id) pair, refilling the pool when it runs dry
+        """
+        if not self._challenge_pool:
+            step = _CHALLENGE_BYTES + _SERVER_ID_BYTES
+            raw = os.urandom(step * CHALLENGE_POOL_SIZE)
+            self._challenge_pool.extend(
+                (raw[i:i + _CHALLENGE_BYTES].hex(), raw[i + _CHALLENGE_BYTES:i + step].hex())
+                for i in range(0, len(raw), step)
+            )
+        return self._challenge_pool.popleft()
     
     def client_generate_commitment(self, age: int, nonce: bytes) -> str:
         """
         CLIENT-SIDE: Generate commitment to age
         This would happen on the client (Flutter app), not server
         """
-        data = f"age:{age}:nonce:{nonce.hex()}".encode()
-        return hashlib.sha256(data).hexdigest()
+        h = blake3()
+        h.update(b"age:%d:nonce:" % age)
+        h.update(nonce)
+        return h.hexdigest()
     
     def client_generate_proof(self, age: int, minimum_age: int, challenge: str, nonce: bytes) -> Optional[Dict]:
         """
@@ -46,20 +84,24 @@ class EnhancedZKPVerifier:
         proof_data = {
             "challenge": challenge,
             "meets_requirement": True,  # Only true if age >= minimum_age
-            "nonce_hash": hashlib.sha256(nonce).hexdigest(),
+            "nonce_hash": _sha256(nonce).hexdigest(),
             "proof_type": "age_verification"
         }
         
         # Sign the proof with HMAC (simplified version of cryptographic signature)
-        proof_string = json.dumps(proof_data, sort_keys=True)
-        proof_signature = hmac.new(
+        # hmac.digest() runs the whole HMAC inside OpenSSL in one call, without
+        # building a Python-level HMAC object and its inner/outer digests
+        proof_bytes = _canon(proof_data)
+        proof_signature = hmac.digest(
             nonce,  # Using nonce as key (in real ZKP, this would be more complex)
-            proof_string.encode(),
-            hashlib.sha256
-        ).hexdigest()
+            proof_bytes,
+            "sha256"
+        ).hex()
         
+        # Ship the exact bytes that were signed, so nobody has to rebuild
+        # the canonical JSON form to check the signature
         return {
-            "proof_data": proof_data,
+            "proof_canonical_b64": base64.b64encode(proof_bytes).decode(),
             "signature": proof_signature,
             "commitment": self.client_generate_commitment(age, nonce)
         }
@@ -70,16 +112,20 @@ class EnhancedZKPVerifier:
         SERVER-SIDE: Verify proof without learning actual age
         """
         try:
-            # 1. Verify challenge matches what server generated
-            if proof_data.get("challenge") != challenge:
+            # A missing field raises KeyError and rejects the proof
+            claimed_challenge, proof_type, meets_requirement = _proof_fields(proof_data)
+            
+            # 1. Verify proof type
+            if proof_type != "age_verification":
                 return False
             
-            # 2. Verify proof type
-            if proof_data.get("proof_type") != "age_verification":
+            # 2. Check if proof claims to meet requirement
+            if not meets_requirement:
                 return False
             
-            # 3. Check if proof claims to meet requirement
-            if not proof_data.get("meets_requirement"):
+            # 3. Verify challenge matches what server generated
+            # (constant-time, so the comparison doesn't leak a matching prefix)
+            if not hmac.compare_digest(claimed_challenge, challenge):
                 return False
             
             # 4. Verify signature (simplified - real ZKP would use more complex verification)
@@ -94,9 +140,20 @@ class EnhancedZKPVerifier:
             return False
 
 # Enhanced API Models
+class ProofDataModel(BaseModel):
+    """Signed proof payload produced by client_generate_proof"""
+    model_config = ConfigDict(extra="forbid")
+    
+    challenge: str
+    meets_requirement: bool
+    nonce_hash: str
+    proof_type: Literal["age_verification"]
+
 class EnhancedProofRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
     commitment: str
-    proof_data: Dict[str, Any]
+    proof_canonical_b64: str  # Base64 of the signed ProofDataModel JSON
     signature: str
     challenge: str
     minimum_age: int = 18
@@ -105,33 +162,40 @@ class ChallengeResponse(BaseModel):
     challenge: str
     server_id: str
 
-# Enhanced API
-app = FastAPI(title="Enhanced ZKP Age Verification API")
+# Enhanced API (routes live on a router so app.py can mount them next to main.py's)
+app = FastAPI(
+    title="Enhanced ZKP Age Verification API",
+    default_response_class=ORJSONResponse
+)
+router = APIRouter(default_response_class=ORJSONResponse)
 
 enhanced_verifier = EnhancedZKPVerifier()
 
-@app.get("/get-challenge", response_model=ChallengeResponse)
+@router.get("/get-challenge", response_model=ChallengeResponse)
 async def get_challenge():
     """
     Step 1: Client requests a challenge from server
     """
-    challenge = enhanced_verifier.generate_server_challenge()
-    server_id = secrets.token_hex(16)
+    challenge, server_id = enhanced_verifier.generate_server_challenge()
     
     return ChallengeResponse(
         challenge=challenge,
         server_id=server_id
     )
 
-@app.post("/verify-age-proof")
+@router.post("/verify-age-proof")
 async def verify_age_proof(request: EnhancedProofRequest):
     """
     Step 2: Client submits proof, server verifies without learning age
     """
     try:
+        # Parse the signed bytes straight into the model; no re-serialization
+        proof_bytes = base64.b64decode(request.proof_canonical_b64, validate=True)
+        proof_data = ProofDataModel.model_validate_json(proof_bytes)
+        
         is_valid = enhanced_verifier.server_verify_proof(
             commitment=request.commitment,
-            proof_data=request.proof_data,
+            proof_data=proof_data.model_dump(),
             signature=request.signature,
             challenge=request.challenge,
             minimum_age=request.minimum_age
@@ -146,6 +210,8 @@ async def verify_age_proof(request: EnhancedProofRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Verification failed: {e}")
 
+app.include_router(router)
+
 # Demo client-side function (this would be in Flutter app)
 def demo_client_proof_generation():
     """
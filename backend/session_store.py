@@ -0,0 +1,149 @@
+"""
+Verification session storage for the zk-SNARKs API
+
+Sessions live in Redis when REDIS_URL is configured, so every uvicorn
+worker (and every host) sees the same sessions and they expire on their
+own. Without it, sessions are kept in process memory, which is enough for
+a single-worker demo.
+"""
+
+from typing import Dict, Any, List, Optional
+from cachetools import TTLCache
+import hmac
+import orjson
+import redis.asyncio as redis
+
+from zksnark_age_verification import CHALLENGE_TTL_SECONDS, MAX_ACTIVE_CHALLENGES
+
+# Sessions expire with the challenge they hold
+SESSION_TTL_SECONDS = CHALLENGE_TTL_SECONDS
+
+# In-memory store cap; the least recently used session is evicted beyond it
+MAX_SESSIONS = MAX_ACTIVE_CHALLENGES
+
+class InMemorySessionStore:
+    """Process-local session store (single worker only), bounded in size and age"""
+
+    def __init__(self, maxsize: int = MAX_SESSIONS, ttl: int = SESSION_TTL_SECONDS):
+        self._sessions: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def create(self, session_id: str, session: Dict[str, Any]) -> None:
+        """Store a new pending session"""
+        self._sessions[session_id] = session
+
+    async def consume(self, session_id: str, challenge: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch and remove a session if challenge is the one it was issued,
+        so it can only be verified once; a wrong challenge leaves it in place
+        """
+        session = self._sessions.get(session_id)
+        # Constant-time compare; issued challenges are ASCII (base64url), so
+        # anything else is a mismatch. No await in between, so nothing else
+        # can consume the session first
+        if (session is None or not challenge.isascii()
+                or not hmac.compare_digest(session["challenge"], challenge)):
+            return None
+        del self._sessions[session_id]
+        return session
+
+    async def consume_many(self, session_ids: List[str], challenges: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """consume() for several sessions, in order"""
+        return [
+            await self.consume(session_id, challenge)
+            for session_id, challenge in zip(session_ids, challenges)
+        ]
+
+    async def all(self) -> Dict[str, Dict[str, Any]]:
+        """Return every live session keyed by session ID"""
+        return dict(self._sessions.items())
+
+    async def clear(self) -> None:
+        """Remove every session"""
+        self._sessions.clear()
+
+    async def expire(self) -> None:
+        """Drop expired sessions now (TTLCache otherwise only expires on access)"""
+        self._sessions.expire()
+
+    async def close(self) -> None:
+        pass
+
+# Deletes and returns each KEYS[i] whose session was issued challenge
+# ARGV[i] (false otherwise), atomically. Lua compares interned strings by
+# reference, so the check takes the same time whether or not they match.
+_CONSUME_SCRIPT = """
+local raws = {}
+for i, key in ipairs(KEYS) do
+  local raw = redis.call('GET', key)
+  if raw and cjson.decode(raw)['challenge'] == ARGV[i] then
+    redis.call('DEL', key)
+    raws[i] = raw
+  else
+    raws[i] = false
+  end
+end
+return raws
+"""
+
+class RedisSessionStore:
+    """Session store shared by all workers through Redis"""
+
+    key_prefix = "session:"
+
+    def __init__(self, client: redis.Redis, ttl: int = SESSION_TTL_SECONDS):
+        self.client = client
+        self.ttl = ttl
+        self._consume = client.register_script(_CONSUME_SCRIPT)
+
+    async def create(self, session_id: str, session: Dict[str, Any]) -> None:
+        """Store a new pending session; Redis drops it after the TTL"""
+        await self.client.set(self.key_prefix + session_id, orjson.dumps(session), ex=self.ttl)
+
+    async def consume(self, session_id: str, challenge: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch and remove a session atomically if challenge is the one it was
+        issued, preventing replay; a wrong challenge leaves it in place
+        """
+        [session] = await self.consume_many([session_id], [challenge])
+        return session
+
+    async def consume_many(self, session_ids: List[str], challenges: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """consume() for several sessions in one round trip (a single script call)"""
+        # Non-ASCII challenges can't match an issued (base64url) one and may
+        # not even encode (lone surrogates), so send "" for them instead
+        args = [challenge if challenge.isascii() else "" for challenge in challenges]
+        raws = await self._consume(keys=[self.key_prefix + session_id for session_id in session_ids], args=args)
+        return [None if raw is None else orjson.loads(raw) for raw in raws]
+
+    async def all(self) -> Dict[str, Dict[str, Any]]:
+        """Return every live session keyed by session ID"""
+        keys = [key async for key in self.client.scan_iter(match=self.key_prefix + "*")]
+        if not keys:
+            return {}
+
+        prefix_length = len(self.key_prefix)
+        values = await self.client.mget(keys)
+        return {
+            key.decode()[prefix_length:]: orjson.loads(raw)
+            for key, raw in zip(keys, values)
+            if raw is not None  # Expired between SCAN and MGET
+        }
+
+    async def clear(self) -> None:
+        """Remove every session without blocking Redis (SCAN + pipelined UNLINK)"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            async for key in self.client.scan_iter(match=self.key_prefix + "*"):
+                pipe.unlink(key)
+            await pipe.execute()
+
+    async def expire(self) -> None:
+        pass  # Redis expires keys itself
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+def create_session_store(redis_url: str = ""):
+    """Use Redis when a URL is configured, process memory otherwise"""
+    if redis_url:
+        return RedisSessionStore(redis.Redis.from_url(redis_url))
+    return InMemorySessionStore()
@@ -0,0 +1,78 @@
+import base64
+import secrets
+
+from fastapi.testclient import TestClient
+
+from enhanced_zkp import CHALLENGE_POOL_SIZE, EnhancedZKPVerifier, _canon, app, enhanced_verifier
+
+client = TestClient(app)
+
+def test_server_challenges_are_unique_across_pool_refills():
+    verifier = EnhancedZKPVerifier()
+    challenges = [verifier.generate_server_challenge() for _ in range(CHALLENGE_POOL_SIZE + 1)]
+
+    assert len({challenge for challenge, _ in challenges}) == len(challenges)
+    assert all(len(challenge) == 64 and len(server_id) == 32 for challenge, server_id in challenges)
+
+def test_get_challenge():
+    response = client.get("/get-challenge")
+    assert response.status_code == 200
+    assert set(response.json()) == {"challenge", "server_id"}
+
+def proof_request(age: int = 25, minimum_age: int = 18) -> dict:
+    challenge = client.get("/get-challenge").json()["challenge"]
+    proof = enhanced_verifier.client_generate_proof(age, minimum_age, challenge, secrets.token_bytes(32))
+    return {**proof, "challenge": challenge, "minimum_age": minimum_age}
+
+def test_client_proof_round_trip():
+    response = client.post("/verify-age-proof", json=proof_request())
+    assert response.status_code == 200
+    assert response.json()["is_valid"] is True
+
+def test_wrong_challenge_is_invalid():
+    request = proof_request()
+    request["challenge"] = "0" * 64
+
+    response = client.post("/verify-age-proof", json=request)
+    assert response.status_code == 200
+    assert response.json()["is_valid"] is False
+
+def test_invalid_base64_is_rejected():
+    request = proof_request()
+    request["proof_canonical_b64"] = "not base64!"
+
+    response = client.post("/verify-age-proof", json=request)
+    assert response.status_code == 400
+
+def test_wrong_proof_type_is_rejected():
+    request = proof_request()
+    proof_data = base64.b64decode(request["proof_canonical_b64"])
+    request["proof_canonical_b64"] = base64.b64encode(
+        proof_data.replace(b'"age_verification"', b'"other"')
+    ).decode()
+
+    response = client.post("/verify-age-proof", json=request)
+    assert response.status_code == 400
+
+def test_extra_proof_field_is_rejected():
+    request = proof_request()
+    request["proof_canonical_b64"] = base64.b64encode(_canon({
+        "challenge": request["challenge"],
+        "meets_requirement": True,
+        "nonce_hash": "00",
+        "proof_type": "age_verification",
+        "age": 25
+    })).decode()
+
+    response = client.post("/verify-age-proof", json=request)
+    assert response.status_code == 400
+
+def test_extra_top_level_field_is_rejected():
+    request = proof_request()
+    request["age"] = 25
+
+    response = client.post("/verify-age-proof", json=request)
+    assert response.status_code == 422
+
+def test_underage_client_cannot_generate_proof():
+    assert enhanced_verifier.client_generate_proof(16, 18, "challenge", secrets.token_bytes(32)) is None
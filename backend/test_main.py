@@ -0,0 +1,51 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import ZKPAgeVerifier, app
+
+client = TestClient(app)
+verifier = ZKPAgeVerifier()
+
+def strptime_age(birth_date: str) -> int:
+    """Age as the original strptime-based calculate_age computed it"""
+    birth = datetime.strptime(birth_date, "%Y-%m-%d").date()
+    today = date.today()
+    return today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+
+def test_calculate_age_matches_strptime_for_every_day():
+    day = date(1950, 1, 1)
+    while day <= date(2030, 12, 31):
+        birth_date = day.isoformat()
+        assert verifier.calculate_age(birth_date) == strptime_age(birth_date), birth_date
+        day += timedelta(days=1)
+
+@pytest.mark.parametrize("birth_date", [
+    "0000-01-01",
+    "2023-02-29",
+    "1900-02-29",
+    "2023-04-31",
+    "2023-00-10",
+    "2023-13-01",
+    "2023-01-00",
+    "2023/01/01",
+    "23-01-01",
+    "2023-1-015",
+    "2023-01-1a",
+    "",
+])
+def test_calculate_age_rejects_what_strptime_rejects(birth_date):
+    with pytest.raises(ValueError):
+        strptime_age(birth_date)
+    with pytest.raises(ValueError):
+        verifier.calculate_age(birth_date)
+
+def test_generate_proof_rejects_year_zero():
+    response = client.post("/generate-proof", json={"birth_date": "0000-01-01", "minimum_age": 18})
+    assert response.status_code == 400
+
+def test_generate_proof_accepts_valid_date():
+    response = client.post("/generate-proof", json={"birth_date": "2000-02-29", "minimum_age": 18})
+    assert response.status_code == 200
+    assert response.json()["is_valid"] is True
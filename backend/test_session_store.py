@@ -0,0 +1,95 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from session_store import SESSION_TTL_SECONDS, InMemorySessionStore, RedisSessionStore
+
+def in_memory_store():
+    return InMemorySessionStore()
+
+def redis_store():
+    return RedisSessionStore(fakeredis.FakeAsyncRedis())
+
+def run(make_store, test):
+    """Run test(store) on a fresh store, inside one event loop"""
+    async def main():
+        store = make_store()
+        try:
+            await test(store)
+        finally:
+            await store.close()
+    asyncio.run(main())
+
+def session(challenge: str, minimum_age: int = 18) -> dict:
+    return {"challenge": challenge, "minimum_age": minimum_age, "status": "pending"}
+
+stores = pytest.mark.parametrize("make_store", [in_memory_store, redis_store])
+
+@stores
+def test_consume_returns_session_once(make_store):
+    async def test(store):
+        await store.create("a", session("x"))
+        assert await store.consume("a", "x") == session("x")
+        assert await store.consume("a", "x") is None
+    run(make_store, test)
+
+@stores
+def test_wrong_challenge_leaves_session(make_store):
+    async def test(store):
+        await store.create("a", session("x"))
+        assert await store.consume("a", "y") is None
+        assert await store.consume("a", "\ud800") is None  # Lone surrogate: can't be encoded
+        assert await store.consume("a", "x\u00e9") is None
+        assert await store.consume("a", "x") == session("x")
+    run(make_store, test)
+
+@stores
+def test_consume_unknown_session(make_store):
+    async def test(store):
+        assert await store.consume("missing", "x") is None
+    run(make_store, test)
+
+@stores
+def test_consume_many_in_order(make_store):
+    async def test(store):
+        await store.create("a", session("x", 18))
+        await store.create("b", session("y", 21))
+        await store.create("c", session("z", 16))
+
+        assert await store.consume_many(["b", "missing", "a", "c", "b"], ["y", "x", "x", "wrong", "y"]) == [
+            session("y", 21),
+            None,
+            session("x", 18),
+            None,  # Wrong challenge
+            None,  # Already consumed earlier in the same call
+        ]
+        assert await store.all() == {"c": session("z", 16)}
+    run(make_store, test)
+
+@stores
+def test_all_and_clear(make_store):
+    async def test(store):
+        await store.create("a", session("x"))
+        await store.create("b", session("y"))
+        assert await store.all() == {"a": session("x"), "b": session("y")}
+
+        await store.clear()
+        assert await store.all() == {}
+    run(make_store, test)
+
+def test_in_memory_sessions_expire():
+    store = InMemorySessionStore(ttl=0)
+
+    async def test():
+        await store.create("a", session("x"))
+        await store.expire()
+        assert await store.all() == {}
+    asyncio.run(test())
+
+def test_redis_sessions_get_ttl():
+    async def test(store):
+        await store.create("a", session("x"))
+        ttl = await store.client.ttl(store.key_prefix + "a")
+        assert 0 < ttl <= SESSION_TTL_SECONDS
+    run(redis_store, test)
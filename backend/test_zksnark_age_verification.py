@@ -0,0 +1,76 @@
+import json
+
+import pytest
+from py_ecc.optimized_bn128 import G1, G2, curve_order, multiply, normalize
+
+import zksnark_age_verification
+from zksnark_age_verification import (
+    ZKSNARKAgeVerifier, _fixed_base_multiply, _g1_table, _g2_table, _load_or_generate_setup
+)
+
+def test_setup_saves_only_public_key_components(tmp_path):
+    path = str(tmp_path / "trusted_setup.json")
+
+    setup = _load_or_generate_setup(path)
+    assert (setup.alpha, setup.beta, setup.gamma, setup.delta) == (None, None, None, None)
+
+    with open(path) as f:
+        assert set(json.load(f)) == {"gamma_abc", "ic"}
+
+    assert _load_or_generate_setup(path) == setup
+
+def test_setup_saved_first_by_another_worker_wins(tmp_path, monkeypatch):
+    path = str(tmp_path / "trusted_setup.json")
+    generate = zksnark_age_verification._generate_trusted_setup
+    other_worker_setup = generate()
+
+    def generate_while_another_worker_saves():
+        # Another worker finds no file either and saves its setup first
+        with open(path, "w") as f:
+            json.dump({"gamma_abc": other_worker_setup.gamma_abc, "ic": other_worker_setup.ic}, f)
+        return generate()
+
+    monkeypatch.setattr(zksnark_age_verification, "_generate_trusted_setup", generate_while_another_worker_saves)
+    assert _load_or_generate_setup(path) == other_worker_setup
+    assert list(tmp_path.iterdir()) == [tmp_path / "trusted_setup.json"]  # No temporary file left
+
+def test_unusable_setup_file_is_replaced(tmp_path):
+    path = tmp_path / "trusted_setup.json"
+    path.write_text("not json")
+
+    setup = _load_or_generate_setup(str(path))
+    assert _load_or_generate_setup(str(path)) == setup
+
+# One window, the first window boundary, and the largest valid scalar
+SCALARS = [1, 255, 256, 257, curve_order - 1]
+
+@pytest.mark.parametrize("k", SCALARS)
+def test_g1_fixed_base_multiply_matches_multiply(k):
+    assert normalize(_fixed_base_multiply(_g1_table(), k)) == normalize(multiply(G1, k))
+
+@pytest.mark.parametrize("k", SCALARS)
+def test_g2_fixed_base_multiply_matches_multiply(k):
+    assert normalize(_fixed_base_multiply(_g2_table(), k)) == normalize(multiply(G2, k))
+
+@pytest.mark.parametrize("public_inputs, expected", [
+    ([18, 1], True),
+    ([0, 1], True),
+    ([18, 0], False),
+    ([-1, 1], False),
+    ([18], False),
+    ([18, 1, 1], False),
+])
+def test_single_and_batch_verification_agree(public_inputs, expected):
+    verifier = ZKSNARKAgeVerifier()
+    proof_data = verifier.client_generate_proof(30, 18, "")
+    proof_data["public_inputs"] = public_inputs
+
+    assert verifier.verify_proof_data(proof_data) is expected
+    assert verifier.verify_proof_data_batch([proof_data]) == [expected]
+
+def test_batch_verification_isolates_invalid_proofs():
+    verifier = ZKSNARKAgeVerifier()
+    valid = verifier.client_generate_proof(30, 18, "")
+    invalid = {**valid, "public_inputs": [18, 0]}
+
+    assert verifier.verify_proof_data_batch([valid, invalid, valid]) == [True, False, True]
@@ -0,0 +1,177 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from session_store import InMemorySessionStore
+from zksnark_main import MAX_BATCH_SIZE, _encode_proof, app, get_session_store, zksnark_verifier
+
+client = TestClient(app)
+
+# Verification doesn't depend on the proof points, so one proof serves every test
+PROOF = _encode_proof(zksnark_verifier.client_generate_proof(30, 18, "")["proof"])
+
+@pytest.fixture(autouse=True)
+def sessions():
+    store = InMemorySessionStore()
+    app.dependency_overrides[get_session_store] = lambda: store
+    yield store
+    app.dependency_overrides.clear()
+
+def request_challenge(minimum_age: int = 18) -> dict:
+    response = client.post("/request-challenge", json={"minimum_age": minimum_age})
+    assert response.status_code == 200
+    return response.json()
+
+def proof_request(session: dict, **overrides) -> dict:
+    request = {
+        "proof": PROOF,
+        "public_inputs": [session["minimum_age"], 1],
+        "challenge": session["challenge"],
+        "session_id": session["session_id"],
+    }
+    request.update(overrides)
+    return request
+
+def test_verify_zkproof_accepts_valid_proof_once():
+    session = request_challenge()
+
+    response = client.post("/verify-zkproof", json=proof_request(session))
+    assert response.status_code == 200
+    assert response.json()["is_valid"] is True
+
+    # The session was consumed, so the same proof can't be replayed
+    response = client.post("/verify-zkproof", json=proof_request(session))
+    assert response.status_code == 400
+
+def test_wrong_challenge_does_not_burn_session():
+    session = request_challenge()
+
+    response = client.post("/verify-zkproof", json=proof_request(session, challenge="junk"))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid session or challenge"
+
+    response = client.post("/verify-zkproof", json=proof_request(session))
+    assert response.status_code == 200
+    assert response.json()["is_valid"] is True
+
+def test_unencodable_challenge_is_a_mismatch():
+    session = request_challenge()
+    # A lone surrogate is valid JSON but can't be encoded as UTF-8
+    raw = json.dumps(proof_request(session, challenge="\ud800"))
+
+    response = client.post("/verify-zkproof", content=raw, headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+
+    response = client.post("/verify-zkproofs-batch", content=f"[{raw}]", headers={"Content-Type": "application/json"})
+    assert response.status_code == 200
+    assert response.json()["results"][0]["message"] == "Invalid session or challenge"
+
+def test_active_sessions_hides_session_ids():
+    session = request_challenge()
+
+    body = client.get("/active-sessions").json()
+    assert body["total_sessions"] == 1
+    assert session["session_id"] not in str(body)
+
+def test_batch_reports_each_entry_in_order():
+    valid, wrong_challenge, wrong_age, false_result = (request_challenge() for _ in range(4))
+
+    response = client.post("/verify-zkproofs-batch", json=[
+        proof_request(valid),
+        proof_request(wrong_challenge, challenge="junk"),
+        proof_request(wrong_age, public_inputs=[21, 1]),
+        proof_request(false_result, public_inputs=[18, 0]),
+        proof_request(valid, session_id="unknown"),
+    ])
+    assert response.status_code == 200
+
+    body = response.json()
+    assert body["all_valid"] is False
+    assert [result["is_valid"] for result in body["results"]] == [True, False, False, False, False]
+    assert [result["message"] for result in body["results"]] == [
+        "Age verification successful ✅",
+        "Invalid session or challenge",
+        "Minimum age mismatch",
+        "Invalid proof ❌",
+        "Invalid session or challenge",
+    ]
+    assert [result["verification_details"]["session_id"] for result in body["results"]] == [
+        valid["session_id"],
+        wrong_challenge["session_id"],
+        wrong_age["session_id"],
+        false_result["session_id"],
+        "unknown",
+    ]
+
+def test_batch_all_valid():
+    sessions = [request_challenge() for _ in range(3)]
+
+    response = client.post("/verify-zkproofs-batch", json=[proof_request(session) for session in sessions])
+    assert response.status_code == 200
+    assert response.json()["all_valid"] is True
+
+def test_batch_duplicate_session_id_is_verified_once():
+    session = request_challenge()
+
+    response = client.post("/verify-zkproofs-batch", json=[proof_request(session), proof_request(session)])
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [result["is_valid"] for result in results] == [True, False]
+    assert results[1]["message"] == "Invalid session or challenge"
+
+def test_batch_failed_entry_keeps_its_session():
+    session = request_challenge()
+
+    response = client.post("/verify-zkproofs-batch", json=[proof_request(session, challenge="junk")])
+    assert response.json()["results"][0]["is_valid"] is False
+
+    response = client.post("/verify-zkproof", json=proof_request(session))
+    assert response.json()["is_valid"] is True
+
+@pytest.mark.parametrize("size", [0, MAX_BATCH_SIZE + 1])
+def test_batch_size_out_of_bounds_is_rejected(size):
+    session = request_challenge()
+
+    response = client.post("/verify-zkproofs-batch", json=[proof_request(session)] * size)
+    assert response.status_code == 422
+
+def test_batch_accepts_max_size():
+    sessions = [request_challenge() for _ in range(MAX_BATCH_SIZE)]
+
+    response = client.post("/verify-zkproofs-batch", json=[proof_request(session) for session in sessions])
+    assert response.status_code == 200
+    assert response.json()["all_valid"] is True
+    assert len(response.json()["results"]) == MAX_BATCH_SIZE
+
+def test_demo_client_proof_verifies():
+    # Entering the client runs startup, which creates the proof pool
+    with TestClient(app) as client:
+        session = client.post("/request-challenge", json={"minimum_age": 18}).json()
+
+        response = client.post("/demo-client-proof", json={
+            "actual_age": 30, "minimum_age": 18, "challenge": session["challenge"]
+        })
+        assert response.status_code == 200
+        proof_data = response.json()["proof_data"]
+
+        response = client.post("/verify-zkproof", json={
+            "proof": proof_data["proof"],
+            "public_inputs": proof_data["public_inputs"],
+            "challenge": session["challenge"],
+            "session_id": session["session_id"]
+        })
+        assert response.status_code == 200
+        assert response.json()["is_valid"] is True
+
+def test_demo_client_proof_refuses_underage():
+    with TestClient(app) as client:
+        response = client.post("/demo-client-proof", json={"actual_age": 16, "minimum_age": 18, "challenge": "x"})
+        assert response.status_code == 200
+        assert response.json()["success"] is False
+
+def test_health_timestamp_follows_the_clock(monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: 1893456000.5)  # 2030-01-01T00:00:00.5Z
+    assert client.get("/health").json()["timestamp"] == "2030-01-01T00:00:00Z"
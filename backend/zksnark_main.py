@@ -5,29 +5,66 @@ This FastAPI server implements true Zero-Knowledge Proofs using zk-SNARKs
 for age verification where the server never learns the user's actual age.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, Depends, FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from datetime import datetime
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, conlist
 from typing import Dict, Any, Optional, List
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import secrets
 import json
+import os
+import time
+
+import orjson
+from decouple import Csv, config
 
 # Import our zk-SNARK implementation
-from zksnark_age_verification import ZKSNARKAgeVerifier, Proof
+from zksnark_age_verification import ZKSNARKAgeVerifier, Proof, warm_fixed_base_tables
+from session_store import create_session_store
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the session sweeper and own the demo proof pool while the app is up"""
+    session_sweeper = asyncio.create_task(_sweep_sessions())
+    # Proof generation is CPU-bound; run it outside the event loop. Workers
+    # start on the first demo request and build the fixed-base tables as
+    # they start, before taking their first job
+    app.state.proof_pool = ProcessPoolExecutor(max_workers=PROOF_WORKERS, initializer=warm_fixed_base_tables)
+    try:
+        yield
+    finally:
+        session_sweeper.cancel()
+        app.state.proof_pool.shutdown()
+        await session_store.close()
 
 app = FastAPI(
     title="zk-SNARKs Age Verification API", 
     version="2.0.0",
-    description="True Zero-Knowledge Age Verification using zk-SNARKs"
+    description="True Zero-Knowledge Age Verification using zk-SNARKs",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Compress larger JSON bodies (/zkp-info, batch results); single-proof
+# responses stay under minimum_size and are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=4)
+
+# Origins allowed to call the API from a browser (comma-separated CORS_ORIGINS;
+# "*" allows any). Local Flutter web builds are allowed on any port.
+CORS_ORIGINS = config("CORS_ORIGINS", default="http://localhost:3000", cast=Csv(post_process=tuple))
+LOCAL_ORIGIN_REGEX = r"http://(localhost|127\.0\.0\.1)(:\d+)?"
+
 # Add CORS middleware for Flutter frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
-    allow_credentials=True,
-    allow_methods=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_origin_regex=LOCAL_ORIGIN_REGEX,
+    allow_credentials=False,  # The API uses no cookies or auth headers
+    allow_methods=["GET", "POST", "DELETE"],
     allow_headers=["*"],
 )
 
@@ -44,9 +81,18 @@ class ChallengeResponse(BaseModel):
     session_id: str
     message: str
 
+# Affine coordinate pair; G1 points are [x, y], G2 points are [[x1, x2], [y1, y2]]
+Coords = conlist(int, min_length=2, max_length=2)
+
+class ZKProof(BaseModel):
+    """zk-SNARK proof points, shape-checked once here so the verifier doesn't have to"""
+    a: Coords  # G1 point
+    b: conlist(Coords, min_length=2, max_length=2)  # G2 point
+    c: Coords  # G1 point
+
 class ZKProofRequest(BaseModel):
-    proof: Dict[str, Any]  # The zk-SNARK proof
-    public_inputs: List[int]  # [minimum_age, result]
+    proof: ZKProof  # The zk-SNARK proof
+    public_inputs: conlist(int, min_length=2, max_length=2)  # [minimum_age, result]
     challenge: str
     session_id: str
 
@@ -55,109 +101,226 @@ class ZKProofResponse(BaseModel):
     message: str
     verification_details: Dict[str, Any]
 
+class ZKProofBatchResponse(BaseModel):
+    all_valid: bool
+    results: List[ZKProofResponse]  # In request order
+
 class ClientProofRequest(BaseModel):
     """For client-side proof generation demo"""
     actual_age: int  # This would normally not be sent to server!
     minimum_age: int
     challenge: str
 
-# Store active sessions
-active_sessions = {}
+# Store active sessions (shared through Redis when REDIS_URL is set)
+session_store = create_session_store(config("REDIS_URL", default=""))
+
+def get_session_store():
+    """Dependency hook so tests can swap in another store (e.g. fakeredis)"""
+    return session_store
+
+# How often expired in-memory sessions are released, even without traffic
+SESSION_SWEEP_INTERVAL_SECONDS = 60
+
+async def _sweep_sessions():
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+        await session_store.expire()
+
+# Second-resolution UTC clock for response timestamps: formatted at most
+# once per second instead of on every request
+_clock_second = 0
+_clock_iso = ""
+
+def _now_iso() -> str:
+    global _clock_second, _clock_iso
+    second = int(time.time())
+    if second != _clock_second:
+        _clock_second = second
+        _clock_iso = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(second))
+    return _clock_iso
+
+def _gen(actual_age: int, minimum_age: int, challenge: str) -> Optional[Dict[str, Any]]:
+    """Generate a demo proof in a worker process (module level so it pickles)"""
+    return zksnark_verifier.client_generate_proof(actual_age, minimum_age, challenge)
+
+def _default_proof_workers() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))  # CPUs this process may run on
+    except AttributeError:
+        cpus = os.cpu_count() or 1  # No sched_getaffinity on macOS/Windows
+    return min(cpus, 2)
+
+# Processes for the /demo-client-proof demo; each holds its own ~15 MB of
+# fixed-base tables, so keep the pool small
+PROOF_WORKERS = config("PROOF_WORKERS", default=_default_proof_workers(), cast=int)
+
+# Static responses are rendered to JSON once, at import
+ROOT_BYTES = orjson.dumps({
+    "message": "zk-SNARKs Age Verification API",
+    "status": "running",
+    "zkp_type": "zk-SNARKs",
+    "zero_knowledge": True
+})
 
 @app.get("/")
 async def root():
-    return {
-        "message": "zk-SNARKs Age Verification API",
-        "status": "running",
-        "zkp_type": "zk-SNARKs",
-        "zero_knowledge": True
-    }
+    return Response(content=ROOT_BYTES, media_type="application/json")
 
-@app.post("/request-challenge", response_model=ChallengeResponse)
-async def request_challenge(request: ChallengeRequest):
+# Handlers below build their response bodies themselves and return them as
+# ORJSONResponse, skipping FastAPI's response_model re-validation; the
+# models are still published in the OpenAPI schema via responses=
+
+@app.post("/request-challenge", responses={200: {"model": ChallengeResponse}})
+async def request_challenge(request: ChallengeRequest, sessions=Depends(get_session_store)):
     """
     Step 1: Client requests a verification challenge
     Server generates random challenge for the zk-SNARK protocol
     """
     try:
-        # Generate cryptographic challenge
-        challenge = zksnark_verifier.generate_challenge()
-        session_id = secrets.token_hex(16)
+        # Generate cryptographic challenge; the session store is its only
+        # record, so any worker sharing the store can verify the proof
+        challenge = zksnark_verifier.new_challenge()
+        session_id = secrets.token_urlsafe(16)
         
-        # Store session information
-        active_sessions[session_id] = {
+        # Store session information (expiry is handled by the store's TTL)
+        await sessions.create(session_id, {
             "challenge": challenge,
             "minimum_age": request.minimum_age,
-            "created_at": datetime.now().isoformat(),
             "status": "pending"
-        }
+        })
         
-        return ChallengeResponse(
-            challenge=challenge,
-            minimum_age=request.minimum_age,
-            session_id=session_id,
-            message="Challenge generated. Generate proof on client side."
-        )
+        return ORJSONResponse({
+            "challenge": challenge,
+            "minimum_age": request.minimum_age,
+            "session_id": session_id,
+            "message": "Challenge generated. Generate proof on client side."
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Challenge generation failed: {e}")
 
-@app.post("/verify-zkproof", response_model=ZKProofResponse)
-async def verify_zkproof(request: ZKProofRequest):
+# Upper bound on proofs per /verify-zkproofs-batch call
+MAX_BATCH_SIZE = 64
+
+def _session_mismatch(session: Optional[Dict[str, Any]], request: ZKProofRequest) -> Optional[str]:
+    """Return why a proof request doesn't match its session, or None if it does"""
+    # The store only hands out a session for its own challenge, so an unknown
+    # session and a wrong challenge are indistinguishable to the caller
+    if session is None:
+        return "Invalid session or challenge"
+    
+    # Verify minimum age matches
+    if request.public_inputs[0] != session["minimum_age"]:
+        return "Minimum age mismatch"
+    
+    return None
+
+def _package_proof(request: ZKProofRequest) -> Dict[str, Any]:
+    """Package proof data for verification"""
+    return {
+        "proof": request.proof.model_dump(),
+        "public_inputs": request.public_inputs,
+        "challenge": request.challenge,
+        "timestamp": _now_iso()
+    }
+
+def _verification_details(session: Optional[Dict[str, Any]], session_id: str, is_valid: bool) -> Dict[str, Any]:
+    return {
+        "zkp_type": "zk-SNARKs",
+        "proof_verified": is_valid,
+        "server_learned_age": False,  # This is the key!
+        "minimum_age_required": session["minimum_age"] if session else None,
+        "cryptographic_security": "Bilinear pairings on elliptic curves",
+        "session_id": session_id
+    }
+
+def _verification_result(
+    session: Optional[Dict[str, Any]], session_id: str, is_valid: bool, message: Optional[str] = None
+) -> Dict[str, Any]:
+    """Response body for one proof, shaped like ZKProofResponse"""
+    return {
+        "is_valid": is_valid,
+        "message": message or ("Age verification successful ✅" if is_valid else "Invalid proof ❌"),
+        "verification_details": _verification_details(session, session_id, is_valid)
+    }
+
+@app.post("/verify-zkproof", responses={200: {"model": ZKProofResponse}})
+async def verify_zkproof(request: ZKProofRequest, sessions=Depends(get_session_store)):
     """
     Step 2: Verify client-generated zk-SNARK proof
     Server verifies proof WITHOUT learning user's actual age
     """
     try:
-        # Validate session
-        if request.session_id not in active_sessions:
-            raise HTTPException(status_code=400, detail="Invalid session ID")
+        # Validate session (fetching it with the right challenge also
+        # consumes it, so it can't be replayed)
+        session = await sessions.consume(request.session_id, request.challenge)
+        mismatch = _session_mismatch(session, request)
+        if mismatch:
+            raise HTTPException(status_code=400, detail=mismatch)
         
-        session = active_sessions[request.session_id]
+        # Verify the zk-SNARK proof
+        is_valid = zksnark_verifier.verify_proof_data(_package_proof(request))
         
-        # Verify challenge matches
-        if session["challenge"] != request.challenge:
-            raise HTTPException(status_code=400, detail="Challenge mismatch")
+        return ORJSONResponse(_verification_result(session, request.session_id, is_valid))
         
-        # Verify minimum age matches
-        if len(request.public_inputs) < 1 or request.public_inputs[0] != session["minimum_age"]:
-            raise HTTPException(status_code=400, detail="Minimum age mismatch")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Proof verification failed: {e}")
+
+@app.post("/verify-zkproofs-batch", responses={200: {"model": ZKProofBatchResponse}})
+async def verify_zkproofs_batch(
+    requests: List[ZKProofRequest] = Body(min_length=1, max_length=MAX_BATCH_SIZE),
+    sessions=Depends(get_session_store)
+):
+    """
+    Verify several client-generated zk-SNARK proofs in one call
+    Proofs whose sessions check out are verified together as one batch;
+    each entry gets its own result, in request order
+    """
+    try:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        batch = []  # (index, session, request) that passed the session checks
         
-        # Package proof data for verification
-        proof_data = {
-            "proof": request.proof,
-            "public_inputs": request.public_inputs,
-            "challenge": request.challenge,
-            "timestamp": datetime.now().isoformat()
-        }
+        # Fetch every session in one go (a single round trip with Redis)
+        batch_sessions = await sessions.consume_many(
+            [request.session_id for request in requests],
+            [request.challenge for request in requests]
+        )
         
-        # Verify the zk-SNARK proof
-        is_valid = zksnark_verifier.server_verify_proof(proof_data, request.challenge)
+        for i, (request, session) in enumerate(zip(requests, batch_sessions)):
+            mismatch = _session_mismatch(session, request)
+            if mismatch:
+                results[i] = _verification_result(session, request.session_id, False, mismatch)
+            else:
+                batch.append((i, session, request))
         
-        # Update session status
-        session["status"] = "completed"
-        session["result"] = is_valid
-        session["verified_at"] = datetime.now().isoformat()
+        verdicts = zksnark_verifier.verify_proof_data_batch(
+            [_package_proof(request) for _, _, request in batch]
+        )
         
-        verification_details = {
-            "zkp_type": "zk-SNARKs",
-            "proof_verified": is_valid,
-            "server_learned_age": False,  # This is the key!
-            "minimum_age_required": session["minimum_age"],
-            "cryptographic_security": "Bilinear pairings on elliptic curves",
-            "session_id": request.session_id
-        }
+        for (i, session, request), is_valid in zip(batch, verdicts):
+            results[i] = _verification_result(session, request.session_id, is_valid)
         
-        return ZKProofResponse(
-            is_valid=is_valid,
-            message="Age verification successful ✅" if is_valid else "Invalid proof ❌",
-            verification_details=verification_details
-        )
+        return ORJSONResponse({
+            "all_valid": all(result["is_valid"] for result in results),
+            "results": results
+        })
         
-    except HTTPException:
-        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Proof verification failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch proof verification failed: {e}")
+
+def _encode_proof(proof: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Write proof coordinates as decimal strings
+    orjson only encodes integers up to 64 bits, and ZKProof parses the
+    strings back into ints when the proof is submitted for verification
+    """
+    return {
+        "a": [str(v) for v in proof["a"]],
+        "b": [[str(v) for v in coords] for coords in proof["b"]],
+        "c": [str(v) for v in proof["c"]]
+    }
 
 @app.post("/demo-client-proof")
 async def demo_client_proof(request: ClientProofRequest):
@@ -167,10 +330,10 @@ async def demo_client_proof(request: ClientProofRequest):
     """
     try:
         # This simulates what happens on the client side
-        proof_data = zksnark_verifier.client_generate_proof(
-            actual_age=request.actual_age,
-            minimum_age=request.minimum_age,
-            challenge=request.challenge
+        loop = asyncio.get_running_loop()
+        proof_data = await loop.run_in_executor(
+            app.state.proof_pool, _gen,
+            request.actual_age, request.minimum_age, request.challenge
         )
         
         if proof_data is None:
@@ -180,6 +343,8 @@ async def demo_client_proof(request: ClientProofRequest):
                 "note": "This demonstrates the soundness property of zk-SNARKs"
             }
         
+        proof_data["proof"] = _encode_proof(proof_data["proof"])
+        
         return {
             "success": True,
             "message": "Proof generated successfully",
@@ -190,77 +355,81 @@ async def demo_client_proof(request: ClientProofRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Demo proof generation failed: {e}")
 
+ZKP_INFO_BYTES = orjson.dumps({
+    "zkp_type": "zk-SNARKs (Zero-Knowledge Succinct Non-Interactive Arguments of Knowledge)",
+    "properties": {
+        "zero_knowledge": "Server never learns actual age",
+        "soundness": "Cannot fake proof if age requirement not met", 
+        "completeness": "Valid proof always convinces verifier",
+        "succinctness": "Proof size is constant regardless of computation",
+        "non_interactive": "No back-and-forth communication needed"
+    },
+    "cryptographic_primitives": {
+        "elliptic_curves": "BN128 pairing-friendly curve",
+        "bilinear_pairings": "For proof verification",
+        "trusted_setup": "Required for zk-SNARK system",
+        "polynomial_commitments": "Hide witness values"
+    },
+    "security_assumptions": {
+        "discrete_log": "Elliptic curve discrete logarithm problem",
+        "trusted_setup": "Setup ceremony must be honest",
+        "random_oracle": "Hash functions modeled as random oracles"
+    },
+    "advantages": [
+        "True zero-knowledge privacy",
+        "Constant proof size",
+        "Fast verification",
+        "Non-interactive"
+    ],
+    "use_cases": [
+        "Age verification without revealing age",
+        "Income verification without revealing salary", 
+        "Credential verification without revealing details",
+        "Compliance checking while preserving privacy"
+    ]
+})
+
 @app.get("/zkp-info")
 async def zkp_info():
     """
     Information about the zk-SNARK implementation
     """
-    return {
-        "zkp_type": "zk-SNARKs (Zero-Knowledge Succinct Non-Interactive Arguments of Knowledge)",
-        "properties": {
-            "zero_knowledge": "Server never learns actual age",
-            "soundness": "Cannot fake proof if age requirement not met", 
-            "completeness": "Valid proof always convinces verifier",
-            "succinctness": "Proof size is constant regardless of computation",
-            "non_interactive": "No back-and-forth communication needed"
-        },
-        "cryptographic_primitives": {
-            "elliptic_curves": "BN128 pairing-friendly curve",
-            "bilinear_pairings": "For proof verification",
-            "trusted_setup": "Required for zk-SNARK system",
-            "polynomial_commitments": "Hide witness values"
-        },
-        "security_assumptions": {
-            "discrete_log": "Elliptic curve discrete logarithm problem",
-            "trusted_setup": "Setup ceremony must be honest",
-            "random_oracle": "Hash functions modeled as random oracles"
-        },
-        "advantages": [
-            "True zero-knowledge privacy",
-            "Constant proof size",
-            "Fast verification",
-            "Non-interactive"
-        ],
-        "use_cases": [
-            "Age verification without revealing age",
-            "Income verification without revealing salary", 
-            "Credential verification without revealing details",
-            "Compliance checking while preserving privacy"
-        ]
-    }
+    return Response(content=ZKP_INFO_BYTES, media_type="application/json")
 
 @app.get("/active-sessions")
-async def get_active_sessions():
+async def get_active_sessions(sessions=Depends(get_session_store)):
     """
     View active verification sessions (for debugging)
+    Session IDs are left out so this endpoint can't be used to find
+    other users' sessions and submit proofs against them
     """
+    active_sessions = await sessions.all()
     return {
         "total_sessions": len(active_sessions),
-        "sessions": {
-            session_id: {
+        "sessions": [
+            {
                 "minimum_age": session["minimum_age"],
-                "status": session["status"],
-                "created_at": session["created_at"]
+                "status": session["status"]
             }
-            for session_id, session in active_sessions.items()
-        }
+            for session in active_sessions.values()
+        ]
     }
 
+# Only the timestamp changes between health checks
+HEALTH_TEMPLATE = b'{"status":"healthy","timestamp":"%s","zkp_system":"zk-SNARKs","version":"2.0.0"}'
+
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "zkp_system": "zk-SNARKs",
-        "version": "2.0.0"
-    }
+    return Response(
+        content=HEALTH_TEMPLATE % _now_iso().encode(),
+        media_type="application/json"
+    )
 
 # Cleanup endpoint
 @app.delete("/cleanup-sessions")
-async def cleanup_sessions():
+async def cleanup_sessions(sessions=Depends(get_session_store)):
     """Clean up old sessions"""
-    global active_sessions
-    active_sessions.clear()
+    await sessions.clear()
     return {"message": "All sessions cleared"}
 
 if __name__ == "__main__":
@@ -268,4 +437,7 @@ if __name__ == "__main__":
     print("🔐 Starting zk-SNARKs Age Verification Server...")
     print("📚 API Documentation: http://localhost:8001/docs")
     print("🔍 ZKP Information: http://localhost:8001/zkp-info")
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # loop="auto" (the default) already picks uvloop when it is installed.
+    # A single worker on purpose: without REDIS_URL, sessions (and with
+    # them the issued challenges) live in process memory.
+    uvicorn.run(app, host="0.0.0.0", port=8001, http="httptools")